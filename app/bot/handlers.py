@@ -8,7 +8,12 @@ Los handlers solo son wrappers que pasan mensajes al Brain.
 import asyncio
 import logging
 import re
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import select
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
@@ -28,9 +33,44 @@ settings = get_settings()
 MAX_MESSAGE_LENGTH = 2000
 BRAIN_TIMEOUT_SECONDS = 30
 
+# Callbacks de solo confirmación (👍): no requieren pasar por el Brain
+ACK_CALLBACKS = frozenset({"ok", "task_ok"})
+
+# Comandos rápidos (botones y /today, /plan): mensaje equivalente para el Brain
+QUICK_COMMANDS = {
+    "cmd_today": "¿Qué tareas tengo para hoy?",
+    "cmd_plan": "Planifica mi día",
+}
+
+# Caracteres de control a eliminar del input (excepto newlines)
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+# Patrones de prompt injection (se evalúan sobre el texto en minúsculas),
+# fusionados en una sola alternación para recorrer el mensaje una vez
+SUSPICIOUS_RE = re.compile(
+    "|".join(
+        f"(?:{pattern})"
+        for pattern in (
+            r'ignor[ae]\s+(las\s+)?instrucciones',
+            r'olvida\s+(lo|todo)\s+anterior',
+            r'system\s*prompt',
+            r'actua\s+como\s+(si\s+fueras|otro)',
+            r'pretende\s+que\s+eres',
+            r'modo\s+(desarrollador|admin|debug)',
+            r'sin\s+restricciones',
+            r'jailbreak',
+            r'dan\s+mode',
+            r'bypass\s+(security|filter)',
+        )
+    )
+)
+
 # Application singleton
 _application: Application | None = None
 
+# telegram_id -> UUID del perfil (el mapeo no cambia una vez creado el perfil)
+_user_id_cache: dict[str, str] = {}
+
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -54,6 +94,32 @@ def _build_keyboard(keyboard_data: list[list[dict]] | None) -> InlineKeyboardMar
     return InlineKeyboardMarkup(buttons)
 
 
+# Keyboards estáticos (los objetos de telegram son inmutables, se comparten)
+START_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📋 Tareas de hoy", callback_data="cmd_today"),
+        InlineKeyboardButton("📅 Planificar", callback_data="cmd_plan"),
+    ],
+    [
+        InlineKeyboardButton("❓ Ayuda", callback_data="help"),
+    ]
+])
+
+RETRY_KEYBOARD = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🔄 Reintentar", callback_data="retry_last")
+]])
+
+ERROR_KEYBOARD = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🆘 Ayuda", callback_data="help"),
+    InlineKeyboardButton("🔄 Reintentar", callback_data="retry_last")
+]])
+
+TASK_COMPLETED_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📋 Ver tareas", callback_data="cmd_today")],
+    [InlineKeyboardButton("➕ Nueva tarea", callback_data="new_task")]
+])
+
+
 def _sanitize_input(text: str) -> str:
     """
     Sanitiza el input del usuario para prevenir prompt injection.
@@ -67,31 +133,17 @@ def _sanitize_input(text: str) -> str:
         text = text[:MAX_MESSAGE_LENGTH] + "..."
 
     # Eliminar caracteres de control (excepto newlines)
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+    text = CONTROL_CHARS_RE.sub('', text)
 
     return text.strip()
 
 
 def _detect_suspicious_patterns(text: str) -> bool:
     """Detecta patrones sospechosos de prompt injection."""
-    suspicious_patterns = [
-        r'ignor[ae]\s+(las\s+)?instrucciones',
-        r'olvida\s+(lo|todo)\s+anterior',
-        r'system\s*prompt',
-        r'actua\s+como\s+(si\s+fueras|otro)',
-        r'pretende\s+que\s+eres',
-        r'modo\s+(desarrollador|admin|debug)',
-        r'sin\s+restricciones',
-        r'jailbreak',
-        r'DAN\s+mode',
-        r'bypass\s+(security|filter)',
-    ]
-
-    text_lower = text.lower()
-    for pattern in suspicious_patterns:
-        if re.search(pattern, text_lower):
-            logger.warning(f"Patrón sospechoso detectado: {pattern}")
-            return True
+    match = SUSPICIOUS_RE.search(text.lower())
+    if match:
+        logger.warning(f"Patrón sospechoso detectado: {match.group(0)!r}")
+        return True
 
     return False
 
@@ -112,8 +164,10 @@ async def _get_or_create_user_profile(telegram_id: str, name: str = "Usuario") -
     Returns:
         UUID del perfil de usuario como string
     """
-    from uuid import uuid4
-    from sqlalchemy import select
+    user_id = _user_id_cache.get(telegram_id)
+    if user_id is not None:
+        return user_id
+
     from app.db.database import get_session
     from app.db.models import UserProfileModel
 
@@ -139,7 +193,9 @@ async def _get_or_create_user_profile(telegram_id: str, name: str = "Usuario") -
             await session.commit()
             logger.info(f"Perfil creado para telegram_id {telegram_id} con UUID {profile.id}")
 
-        return str(profile.id)
+        user_id = str(profile.id)
+        _user_id_cache[telegram_id] = user_id
+        return user_id
 
 
 # ==================== COMMAND HANDLERS ====================
@@ -153,16 +209,6 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     # Crear/obtener user_profile (usa UUID internamente)
     await _get_or_create_user_profile(telegram_id, user.first_name)
 
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📋 Tareas de hoy", callback_data="cmd_today"),
-            InlineKeyboardButton("📅 Planificar", callback_data="cmd_plan"),
-        ],
-        [
-            InlineKeyboardButton("❓ Ayuda", callback_data="help"),
-        ]
-    ])
-
     await update.message.reply_html(
         f"<b>👋 Hola {user.first_name}!</b>\n\n"
         "Soy <b>Carlos Command</b>, tu asistente personal inteligente.\n\n"
@@ -172,26 +218,12 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         "├── <i>\"Gasté $500 en comida\"</i>\n"
         "└── <i>\"Planifica mi día\"</i>\n\n"
         "🚀 <b>¿Por dónde empezamos?</b>",
-        reply_markup=keyboard
+        reply_markup=START_KEYBOARD
     )
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handler para /help."""
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📋 Tareas", callback_data="help_tasks"),
-            InlineKeyboardButton("💰 Finanzas", callback_data="help_finance"),
-        ],
-        [
-            InlineKeyboardButton("🏋️ Salud", callback_data="help_health"),
-            InlineKeyboardButton("📅 Planificación", callback_data="help_plan"),
-        ],
-        [
-            InlineKeyboardButton("💡 Ejemplos", callback_data="help_examples"),
-        ]
-    ])
-
     await update.message.reply_html(
         "<b>🤖 Carlos Command - Ayuda</b>\n\n"
         "Soy tu asistente personal. Puedes escribirme de forma natural.\n\n"
@@ -200,7 +232,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "├── /plan → Planificar el día\n"
         "└── /status → Estado del sistema\n\n"
         "Selecciona una categoría para más info:",
-        reply_markup=keyboard
+        reply_markup=HELP_KEYBOARDS["help"]
     )
 
 
@@ -210,7 +242,7 @@ async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     user_id = await _get_or_create_user_profile(telegram_id)
 
     brain = await get_brain(user_id)
-    response = await brain.handle_message("¿Qué tareas tengo para hoy?")
+    response = await brain.handle_message(QUICK_COMMANDS["cmd_today"])
 
     if response.message:
         await update.message.reply_html(
@@ -225,7 +257,7 @@ async def plan_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     user_id = await _get_or_create_user_profile(telegram_id)
 
     brain = await get_brain(user_id)
-    response = await brain.handle_message("Planifica mi día")
+    response = await brain.handle_message(QUICK_COMMANDS["cmd_plan"])
 
     if response.message:
         await update.message.reply_html(
@@ -236,7 +268,6 @@ async def plan_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handler para /status."""
-    from datetime import datetime
     from app.triggers.scheduler import get_scheduled_triggers
 
     triggers = get_scheduled_triggers()
@@ -301,9 +332,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logger.error(f"Timeout procesando mensaje de {telegram_id}")
             await update.message.reply_html(
                 "⏱️ La solicitud tardó demasiado. Intenta con algo más simple o vuelve a intentar.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔄 Reintentar", callback_data="retry_last")
-                ]])
+                reply_markup=RETRY_KEYBOARD
             )
             return
 
@@ -323,10 +352,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_html(
             "❌ Ocurrió un error procesando tu mensaje.\n\n"
             "<i>Intenta de nuevo o usa /help para ver comandos disponibles.</i>",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🆘 Ayuda", callback_data="help"),
-                InlineKeyboardButton("🔄 Reintentar", callback_data="retry_last")
-            ]])
+            reply_markup=ERROR_KEYBOARD
         )
 
 
@@ -411,6 +437,12 @@ HELP_RESPONSES = {
     ),
 }
 
+# Keyboards de ayuda precalculados
+HELP_KEYBOARDS = {
+    key: _build_keyboard(keyboard_data)
+    for key, (_, keyboard_data) in HELP_RESPONSES.items()
+}
+
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -424,6 +456,16 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     logger.info(f"Callback de {telegram_id}: {callback_data}")
 
+    # Fast path: confirmaciones simples, se quitan los botones sin llamar al LLM
+    if callback_data in ACK_CALLBACKS:
+        await query.answer("👍")
+        try:
+            await query.edit_message_reply_markup(reply_markup=None)
+        except BadRequest as e:
+            # Mensaje viejo o ya sin botones
+            logger.debug(f"No se pudo quitar keyboard: {e}")
+        return
+
     # Responder inmediatamente para evitar timeout y dar feedback
     # Para callbacks del Brain, mostrar "procesando"
     if callback_data not in HELP_RESPONSES and not callback_data.startswith("cmd_"):
@@ -434,29 +476,20 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     try:
         # Manejar callbacks especiales de ayuda
         if callback_data in HELP_RESPONSES:
-            text, keyboard_data = HELP_RESPONSES[callback_data]
+            text, _ = HELP_RESPONSES[callback_data]
             await query.edit_message_text(
                 text,
                 parse_mode="HTML",
-                reply_markup=_build_keyboard(keyboard_data)
+                reply_markup=HELP_KEYBOARDS[callback_data]
             )
             return
 
         # Manejar comandos rápidos
-        if callback_data == "cmd_today":
-            user_id = await _get_or_create_user_profile(telegram_id)
-            brain = await get_brain(user_id)
-            response = await brain.handle_message("¿Qué tareas tengo para hoy?")
-            await query.message.reply_html(
-                response.message,
-                reply_markup=_build_keyboard(response.keyboard)
-            )
-            return
-
-        if callback_data == "cmd_plan":
+        quick_message = QUICK_COMMANDS.get(callback_data)
+        if quick_message is not None:
             user_id = await _get_or_create_user_profile(telegram_id)
             brain = await get_brain(user_id)
-            response = await brain.handle_message("Planifica mi día")
+            response = await brain.handle_message(quick_message)
             await query.message.reply_html(
                 response.message,
                 reply_markup=_build_keyboard(response.keyboard)
@@ -480,10 +513,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 await query.edit_message_text(
                     f"🎉 <b>¡Tarea completada!</b>\n\n✅ {result.message}",
                     parse_mode="HTML",
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("📋 Ver tareas", callback_data="cmd_today")],
-                        [InlineKeyboardButton("➕ Nueva tarea", callback_data="new_task")]
-                    ])
+                    reply_markup=TASK_COMPLETED_KEYBOARD
                 )
             else:
                 await query.edit_message_text(
@@ -505,8 +535,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     parse_mode="HTML",
                     reply_markup=_build_keyboard(response.keyboard)
                 )
-            except Exception:
-                # Si no se puede editar, enviar nuevo mensaje
+            except BadRequest:
+                # Si no se puede editar (mensaje viejo o sin cambios), enviar nuevo
                 await query.message.reply_html(
                     response.message,
                     reply_markup=_build_keyboard(response.keyboard)
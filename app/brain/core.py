@@ -5,24 +5,46 @@ Un solo cerebro que procesa todos los triggers y mensajes,
 con acceso a tools y memoria contextual.
 """
 
+import asyncio
 import json
 import logging
+import re
 from dataclasses import dataclass
 from datetime import datetime
+from functools import cached_property
 from typing import Any
 
 import google.generativeai as genai
+from google.api_core.exceptions import GoogleAPIError
 
+from app.brain.gemini import configure_gemini
 from app.brain.memory import MemoryManager, LongTermMemory
 from app.brain.tools import ToolRegistry, ToolResult
-from app.brain.prompts import CARLOS_SYSTEM_PROMPT, get_trigger_prompt
+from app.brain.prompts import (
+    CARLOS_SYSTEM_PROMPT,
+    RESPONSE_FORMAT_INSTRUCTIONS,
+    TOOL_RESULTS_INSTRUCTIONS,
+    get_trigger_prompt,
+)
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Máximo de llamadas simultáneas a Gemini entre todos los usuarios y triggers
+LLM_CONCURRENCY = 8
+_llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
 
-@dataclass
+# Bloque markdown (```json ... ```) que el LLM a veces agrega alrededor del JSON
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?|```\s*$")
+
+
+def _strip_code_fence(text: str) -> str:
+    """Limpia el bloque markdown de la respuesta del LLM."""
+    return _CODE_FENCE_RE.sub("", text).strip()
+
+
+@dataclass(slots=True)
 class BrainResponse:
     """Respuesta del Brain después de procesar."""
     message: str | None = None  # Mensaje para el usuario
@@ -62,9 +84,13 @@ class CarlosBrain:
         self.long_term = LongTermMemory(user_id)
         self.tools = ToolRegistry(user_id)
 
-        # LLM (Gemini)
-        genai.configure(api_key=settings.gemini_api_key)
-        self.model = genai.GenerativeModel(
+        self._initialized = False
+
+    @cached_property
+    def model(self) -> genai.GenerativeModel:
+        """LLM (Gemini), creado en el primer uso."""
+        configure_gemini()
+        return genai.GenerativeModel(
             model_name="gemini-2.0-flash-exp",
             generation_config={
                 "temperature": 0.7,
@@ -73,8 +99,6 @@ class CarlosBrain:
             system_instruction=CARLOS_SYSTEM_PROMPT,
         )
 
-        self._initialized = False
-
     async def initialize(self) -> None:
         """Inicializa el Brain cargando memoria."""
         if self._initialized:
@@ -103,6 +127,10 @@ class CarlosBrain:
         Returns:
             BrainResponse con mensaje, keyboard y metadata
         """
+        # Sin input no hay nada que decidir: evitar construir prompt y llamar al LLM
+        if not (user_message or trigger or callback_data):
+            return BrainResponse(should_save_memory=False)
+
         if not self._initialized:
             await self.initialize()
 
@@ -121,14 +149,20 @@ class CarlosBrain:
             # 3. Procesar respuesta (ejecutar tools si hay)
             result = await self._process_response(response, original_message=user_message)
 
-            # 4. Guardar en memoria
+            # 4. Guardar en memoria (mensajes + working memory en una transacción)
             if user_message:
-                await self.memory.add_message("user", user_message, trigger_type=trigger)
+                await self.memory.add_message(
+                    "user",
+                    user_message,
+                    trigger_type=trigger,
+                    defer_save=True,
+                )
             if result.message:
                 await self.memory.add_message(
                     "assistant",
                     result.message,
                     trigger_type=trigger,
+                    defer_save=True,
                 )
 
             await self.memory.save()
@@ -139,7 +173,7 @@ class CarlosBrain:
             logger.exception(f"Error en Brain.process: {e}")
             return BrainResponse(
                 message="Lo siento, ocurrió un error. ¿Puedes intentar de nuevo?",
-                action_taken=f"error: {str(e)}"
+                action_taken=f"error: {e}"
             )
 
     async def _build_prompt(
@@ -149,17 +183,20 @@ class CarlosBrain:
         context: dict | None,
         callback_data: str | None,
     ) -> str:
-        """Construye el prompt completo para el LLM."""
+        """
+        Construye el prompt completo para el LLM.
+
+        Las secciones estáticas (tools, formato, instrucciones del trigger) van
+        primero y las volátiles (memoria, hora, mensaje) al final, para que el
+        prefijo sea idéntico entre llamadas y aproveche el caché de prompts.
+        """
         parts = []
 
-        # Contexto de memoria
-        memory_context = self.memory.get_context_for_llm()
-        parts.append(f"## CONTEXTO DE MEMORIA\n{json.dumps(memory_context, indent=2, default=str)}")
+        # Tools disponibles
+        parts.append(f"## TOOLS DISPONIBLES\n{self.tools.tools_schema_json}")
 
-        # Contexto temporal
-        current_context = await self.tools.execute("get_current_context")
-        if current_context.success:
-            parts.append(f"## CONTEXTO ACTUAL\n{json.dumps(current_context.data, indent=2)}")
+        # Instrucciones de formato
+        parts.append(RESPONSE_FORMAT_INSTRUCTIONS)
 
         # Prompt específico del trigger
         if trigger:
@@ -167,9 +204,18 @@ class CarlosBrain:
             if trigger_prompt:
                 parts.append(f"## INSTRUCCIONES DEL TRIGGER ({trigger})\n{trigger_prompt}")
 
+        # Contexto de memoria
+        memory_context = self.memory.get_context_for_llm()
+        parts.append(f"## CONTEXTO DE MEMORIA\n{json.dumps(memory_context, indent=2, default=str, ensure_ascii=False)}")
+
+        # Contexto temporal
+        current_context = await self.tools.execute("get_current_context")
+        if current_context.success:
+            parts.append(f"## CONTEXTO ACTUAL\n{json.dumps(current_context.data, indent=2, ensure_ascii=False)}")
+
         # Contexto adicional
         if context:
-            parts.append(f"## CONTEXTO ADICIONAL\n{json.dumps(context, indent=2, default=str)}")
+            parts.append(f"## CONTEXTO ADICIONAL\n{json.dumps(context, indent=2, default=str, ensure_ascii=False)}")
 
         # Callback de botón
         if callback_data:
@@ -181,118 +227,18 @@ class CarlosBrain:
         elif trigger:
             parts.append(f"## TRIGGER\nEste es un trigger automático: {trigger}")
 
-        # Tools disponibles
-        tools_schema = self.tools.get_tools_schema()
-        parts.append(f"## TOOLS DISPONIBLES\n{json.dumps(tools_schema, indent=2)}")
-
-        # Instrucciones de formato
-        parts.append("""
-## FORMATO DE RESPUESTA
-
-IMPORTANTE: Debes responder en JSON válido con esta estructura:
-{
-    "reasoning": "Tu razonamiento interno (breve)",
-    "tool_calls": [
-        {"tool": "nombre_tool", "args": {...}},
-        ...
-    ],
-    "response": {
-        "message": "Mensaje COMPLETO para el usuario (HTML para Telegram)",
-        "keyboard": [[{"text": "Botón", "callback_data": "action"}]] o null
-    },
-    "memory_updates": {
-        "active_entity": {"type": "task", "id": "xxx", "title": "yyy"} o null,
-        "conversation_mode": "task_management" o null
-    }
-}
-
-REGLAS CRÍTICAS:
-1. NUNCA uses mensajes de "cargando" como "Obteniendo tus tareas..." - siempre da una respuesta FINAL
-2. Si no hay tareas, dilo claramente
-3. Si hay tareas, formátealas con emojis y estructura clara
-4. PROHIBIDO incluir corchetes con texto de botones en el mensaje. Esto está MAL: "[✅ OK] [📝 Editar]"
-5. El campo "message" es SOLO texto HTML puro, SIN representación de botones
-6. Los botones van ÚNICAMENTE en "keyboard" como array de arrays
-7. Máximo 2 botones por fila para que no se corten en móvil
-
-Ejemplo tarea creada (CORRECTO):
-{
-    "response": {
-        "message": "✅ <b>Tarea creada:</b>\\n\\n📋 Revisar código\\n├── 💼 PayCash\\n└── ⏱️ ~30 min",
-        "keyboard": [[{"text": "👍", "callback_data": "task_ok"}], [{"text": "📝 Editar", "callback_data": "task_edit"}]]
-    }
-}
-
-Ejemplo INCORRECTO (NO hacer esto):
-{
-    "response": {
-        "message": "✅ Tarea creada...\\n\\n[✅ OK] [📝 Editar]",
-        "keyboard": null
-    }
-}
-
-Ejemplo cuando NO hay tareas:
-{
-    "response": {
-        "message": "📋 <b>Tareas de hoy</b>\\n\\n✨ No tienes tareas pendientes.",
-        "keyboard": [[{"text": "➕ Nueva tarea", "callback_data": "new_task"}]]
-    }
-}
-
-Ejemplo LISTA de tareas (con botones INDIVIDUALES por tarea):
-{
-    "response": {
-        "message": "📋 <b>Tareas de hoy</b>\\n\\n1️⃣ Revisar PRs\\n├── 💼 PayCash\\n└── ⏱️ ~30 min\\n\\n2️⃣ Actualizar docs\\n├── 💼 PayCash\\n└── ⏱️ ~1h",
-        "keyboard": [
-            [{"text": "✅ Completar #1", "callback_data": "complete_task_UUID1"}],
-            [{"text": "✅ Completar #2", "callback_data": "complete_task_UUID2"}],
-            [{"text": "➕ Nueva", "callback_data": "new_task"}]
-        ]
-    }
-}
-
-Ejemplo tarea COMPLETADA (celebra y ofrece siguiente):
-{
-    "response": {
-        "message": "🎉 <b>¡Tarea completada!</b>\\n\\n✅ Revisar PRs\\n\\n📊 Progreso: 2/5 tareas hoy",
-        "keyboard": [
-            [{"text": "📋 Ver siguientes", "callback_data": "show_tasks"}],
-            [{"text": "➕ Nueva tarea", "callback_data": "new_task"}]
-        ]
-    }
-}
-
-REGLA IMPORTANTE PARA LISTAS:
-- Cada tarea debe tener su PROPIO botón de completar con el UUID real
-- NO uses "finalizar todas" a menos que el usuario lo pida explícitamente
-- Los callback_data deben incluir el UUID real: "complete_task_abc123"
-
-Si no necesitas enviar mensaje (ej: hourly_pulse sin nada relevante), usa:
-{
-    "reasoning": "No hay nada relevante que reportar",
-    "tool_calls": [],
-    "response": null,
-    "memory_updates": null
-}
-""")
-
         return "\n\n".join(parts)
 
+    async def _generate(self, prompt: str) -> genai.types.GenerateContentResponse:
+        """Llama a Gemini respetando el límite global de concurrencia."""
+        async with _llm_semaphore:
+            return await self.model.generate_content_async(prompt)
+
     async def _call_llm(self, prompt: str) -> dict:
         """Llama al LLM y parsea la respuesta."""
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text
-
-            # Limpiar markdown si hay
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-
-            return json.loads(text.strip())
+            response = await self._generate(prompt)
+            return json.loads(_strip_code_fence(response.text))
 
         except json.JSONDecodeError as e:
             logger.error(f"Error parseando respuesta del LLM: {e}")
@@ -310,18 +256,25 @@ Si no necesitas enviar mensaje (ej: hourly_pulse sin nada relevante), usa:
 
     async def _process_response(self, llm_response: dict, original_message: str | None = None) -> BrainResponse:
         """Procesa la respuesta del LLM, ejecutando tools si necesario."""
-        tools_called = []
         tool_results = []
 
         # Ejecutar tools
         tool_calls = llm_response.get("tool_calls", [])
-        for call in tool_calls:
-            tool_name = call.get("tool")
-            args = call.get("args", {})
+        calls = [(call.get("tool"), call.get("args", {})) for call in tool_calls]
+        tools_called = [tool_name for tool_name, _ in calls]
 
+        async def run_tool(tool_name: str, args: dict) -> ToolResult:
             logger.info(f"Ejecutando tool: {tool_name} con args: {args}")
-            result = await self.tools.execute(tool_name, **args)
-            tools_called.append(tool_name)
+            return await self.tools.execute(tool_name, **args)
+
+        if len(calls) > 1 and all(self.tools.is_read_only(tool_name) for tool_name in tools_called):
+            # Consultas independientes: una sola espera en vez de N secuenciales
+            results = await asyncio.gather(*(run_tool(tool_name, args) for tool_name, args in calls))
+        else:
+            # Escrituras pueden depender del orden (crear y luego completar)
+            results = [await run_tool(tool_name, args) for tool_name, args in calls]
+
+        for tool_name, result in zip(tools_called, results, strict=True):
             tool_results.append({
                 "tool": tool_name,
                 "success": result.success,
@@ -388,48 +341,13 @@ Si no necesitas enviar mensaje (ej: hourly_pulse sin nada relevante), usa:
 ## RESULTADOS DE LOS TOOLS EJECUTADOS
 {json.dumps(tool_results, indent=2, default=str, ensure_ascii=False)}
 
-## INSTRUCCIONES
-Basándote en los resultados de los tools, genera la respuesta para el usuario.
-
-REGLAS CRÍTICAS:
-1. El mensaje debe ser texto HTML puro, SIN corchetes de botones
-2. PROHIBIDO escribir [✅ OK] o [Botón] en el mensaje - eso va en keyboard
-3. Si el tool fue create_task → confirma la creación con datos
-4. Si el tool fue complete_task → celebra la completación
-5. Usa emojis para estructura visual
-
-EJEMPLO CORRECTO para tarea creada:
-{{
-    "message": "✅ <b>Tarea creada:</b>\\n\\n📋 Nombre de la tarea\\n├── 💼 Contexto\\n└── ⏱️ ~30 min",
-    "keyboard": [[{{"text": "👍", "callback_data": "ok"}}]]
-}}
-
-EJEMPLO INCORRECTO (NUNCA hacer esto):
-{{
-    "message": "✅ Tarea creada...\\n\\n[✅ OK]",
-    "keyboard": null
-}}
-
-Responde SOLO con JSON válido:
-{{
-    "message": "Mensaje HTML",
-    "keyboard": [[{{"text": "Texto", "callback_data": "accion"}}]] o null
-}}
-"""
+{TOOL_RESULTS_INSTRUCTIONS}"""
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text
-
-            # Limpiar markdown
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-
-            return json.loads(text.strip())
-        except Exception as e:
+            response = await self._generate(prompt)
+            return json.loads(_strip_code_fence(response.text))
+        except (ValueError, GoogleAPIError) as e:
+            # ValueError cubre JSON inválido y response.text sin candidatos
+            # (respuesta bloqueada); otros errores son bugs y deben propagarse
             logger.error(f"Error generando respuesta con tool results: {e}")
             return None
 
@@ -459,14 +377,25 @@ Responde SOLO con JSON válido:
 # ==================== Singleton ====================
 
 _brain_instances: dict[str, CarlosBrain] = {}
+_brain_locks: dict[str, asyncio.Lock] = {}
 
 
 async def get_brain(user_id: str) -> CarlosBrain:
     """Obtiene o crea una instancia del Brain para un usuario."""
-    if user_id not in _brain_instances:
-        brain = CarlosBrain(user_id)
-        await brain.initialize()
-        _brain_instances[user_id] = brain
+    brain = _brain_instances.get(user_id)
+    if brain is not None:
+        return brain
+
+    # initialize() hace await: sin lock, dos requests concurrentes
+    # crearían (y cargarían memoria para) dos Brains del mismo usuario.
+    # El lock es por usuario para que las cargas de usuarios distintos
+    # sigan corriendo en paralelo
+    lock = _brain_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        if user_id not in _brain_instances:
+            brain = CarlosBrain(user_id)
+            await brain.initialize()
+            _brain_instances[user_id] = brain
 
     return _brain_instances[user_id]
 
@@ -3,27 +3,24 @@ Embeddings para RAG usando Google Gemini API.
 Más ligero que sentence-transformers (no requiere PyTorch).
 """
 
+import asyncio
 import logging
+from collections import OrderedDict
+
 import numpy as np
 import google.generativeai as genai
-from app.config import get_settings
+
+from app.brain.gemini import configure_gemini
 
 logger = logging.getLogger(__name__)
 
 # Modelo de embeddings de Gemini (768 dimensiones)
 MODEL_NAME = "models/text-embedding-004"
 
-_configured = False
-
-
-def _ensure_configured():
-    """Configura la API de Gemini si no está configurada."""
-    global _configured
-    if not _configured:
-        settings = get_settings()
-        genai.configure(api_key=settings.gemini_api_key)
-        _configured = True
-        logger.info(f"Gemini embeddings configurado: {MODEL_NAME}")
+# Cache LRU de embeddings por texto (los títulos se repiten entre
+# búsqueda de duplicados, RAG y creación de tareas)
+EMBEDDING_CACHE_SIZE = 256
+_embedding_cache: OrderedDict[str, list[float]] = OrderedDict()
 
 
 async def get_embedding(text: str) -> list[float]:
@@ -36,9 +33,15 @@ async def get_embedding(text: str) -> list[float]:
     Returns:
         Lista de 768 floats (compatible con pgvector/psycopg3)
     """
-    _ensure_configured()
+    cached = _embedding_cache.get(text)
+    if cached is not None:
+        _embedding_cache.move_to_end(text)
+        return list(cached)
+
+    configure_gemini()
 
-    result = genai.embed_content(
+    result = await asyncio.to_thread(
+        genai.embed_content,
         model=MODEL_NAME,
         content=text,
         task_type="retrieval_document"
@@ -46,7 +49,13 @@ async def get_embedding(text: str) -> list[float]:
 
     # Retornar como lista de Python para compatibilidad con pgvector/psycopg3
     # psycopg3 necesita una lista, no un numpy array
-    return [float(x) for x in result["embedding"]]
+    embedding = [float(x) for x in result["embedding"]]
+
+    _embedding_cache[text] = embedding
+    if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+        _embedding_cache.popitem(last=False)
+
+    return list(embedding)
 
 
 async def get_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
@@ -59,10 +68,14 @@ async def get_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
     Returns:
         Lista de vectores numpy
     """
-    _ensure_configured()
+    if not texts:
+        return []
+
+    configure_gemini()
 
     # Gemini soporta batch embedding
-    result = genai.embed_content(
+    result = await asyncio.to_thread(
+        genai.embed_content,
         model=MODEL_NAME,
         content=texts,
         task_type="retrieval_document"
@@ -74,9 +87,7 @@ async def get_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
 
 def cosine_similarity(vec1: list[float], vec2: list[float]) -> float:
     """Calcula similitud coseno entre dos vectores."""
-    import numpy as np
-
-    a = np.array(vec1)
-    b = np.array(vec2)
+    a = np.asarray(vec1, dtype=np.float64)
+    b = np.asarray(vec2, dtype=np.float64)
 
     return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
@@ -0,0 +1,24 @@
+"""
+Configuración compartida del cliente de Gemini.
+
+La usan tanto el LLM del Brain como los embeddings.
+"""
+
+import logging
+
+import google.generativeai as genai
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+
+
+def configure_gemini() -> None:
+    """Configura la API key de Gemini una sola vez por proceso."""
+    global _configured
+    if not _configured:
+        genai.configure(api_key=get_settings().gemini_api_key)
+        _configured = True
+        logger.info("Cliente de Gemini configurado")
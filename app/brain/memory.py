@@ -7,21 +7,24 @@ Tres niveles de memoria:
 3. Long-term Memory: RAG + patrones aprendidos
 """
 
+import asyncio
 import logging
-from dataclasses import dataclass, field
+from collections.abc import Callable, Coroutine
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta
 from typing import Any
 from uuid import UUID
 
-from sqlalchemy import select, delete, and_, desc
+from sqlalchemy import select, delete, and_, desc, func, literal
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
 from app.db.database import get_session
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ActiveEntity:
     """Entidad actualmente en foco de la conversación."""
     type: str  # task, project, reminder, etc.
@@ -102,7 +105,7 @@ class WorkingMemory:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationMessage:
     """Un mensaje en el historial de conversación."""
     role: str  # user, assistant, system
@@ -140,20 +143,60 @@ class MemoryManager:
         self.working = WorkingMemory(user_id=user_id)
         self.short_term: list[ConversationMessage] = []
 
+        # Mensajes pendientes de persistir en el próximo save()
+        self._unsaved: list[ConversationMessage] = []
+
+        # Working memory tal como está en BD (None = aún no sincronizada)
+        self._saved_working: dict | None = None
+
+        # Serializa save(): dos process() del mismo usuario no deben cruzar
+        # la comparación contra _saved_working con la escritura del otro
+        self._save_lock = asyncio.Lock()
+
     async def load(self) -> None:
         """Carga el estado de memoria desde la BD."""
-        async with get_session() as session:
-            # Cargar working memory
-            await self._load_working_memory(session)
+        # Working y short-term son independientes: cada una en su propia
+        # sesión para cargarlas en paralelo (una AsyncSession no es concurrente)
+        await asyncio.gather(
+            self._load_in_session(self._load_working_memory),
+            self._load_in_session(self._load_short_term),
+        )
+        self._saved_working = asdict(self.working)
 
-            # Cargar short-term memory
-            await self._load_short_term(session)
+    async def _load_in_session(
+        self,
+        loader: Callable[[AsyncSession], Coroutine[Any, Any, None]]
+    ) -> None:
+        """Ejecuta un loader con una sesión propia."""
+        async with get_session() as session:
+            await loader(session)
 
     async def save(self) -> None:
-        """Guarda el estado de memoria en la BD."""
-        async with get_session() as session:
-            await self._save_working_memory(session)
-            await session.commit()
+        """Guarda el estado de memoria (y mensajes diferidos) en una transacción."""
+        async with self._save_lock:
+            # Snapshot tomado bajo el lock: lo que se escriba será al menos esto
+            working = asdict(self.working)
+
+            # Nada nuevo que persistir (p.ej. trigger sin mensaje): evitar el round-trip
+            if not self._unsaved and working == self._saved_working:
+                return
+
+            # Tomar los pendientes antes del primer await: otro process() del mismo
+            # usuario puede agregar mensajes mientras esta transacción está en curso
+            pending, self._unsaved = self._unsaved, []
+
+            try:
+                async with get_session() as session:
+                    for message in pending:
+                        await self._save_message(session, message)
+                    await self._save_working_memory(session)
+                    await session.commit()
+            except Exception:
+                # Reintentarlos en el próximo save(), antes que los más nuevos
+                self._unsaved[:0] = pending
+                raise
+
+            self._saved_working = working
 
     async def add_message(
         self,
@@ -162,9 +205,15 @@ class MemoryManager:
         trigger_type: str | None = None,
         intent: str | None = None,
         entities: dict | None = None,
-        save_to_db: bool = True
+        save_to_db: bool = True,
+        defer_save: bool = False
     ) -> None:
-        """Agrega un mensaje al historial."""
+        """
+        Agrega un mensaje al historial.
+
+        Con defer_save=True el mensaje se persiste en el próximo save(),
+        junto con la working memory, en una sola transacción.
+        """
         message = ConversationMessage(
             role=role,
             content=content,
@@ -181,7 +230,9 @@ class MemoryManager:
             self.short_term = self.short_term[-self.short_term_limit:]
 
         # Guardar en BD
-        if save_to_db:
+        if save_to_db and defer_save:
+            self._unsaved.append(message)
+        elif save_to_db:
             async with get_session() as session:
                 await self._save_message(session, message)
                 await session.commit()
@@ -212,9 +263,7 @@ class MemoryManager:
         if not self.short_term:
             return "Nueva sesión, sin historial reciente."
 
-        user_messages = [m for m in self.short_term if m.role == "user"]
-
-        if not user_messages:
+        if not any(m.role == "user" for m in self.short_term):
             return "Sesión iniciada por sistema (trigger automático)."
 
         # Resumen básico
@@ -298,6 +347,7 @@ class MemoryManager:
 
         result = await session.execute(
             select(ConversationHistoryModel)
+            .options(defer(ConversationHistoryModel.embedding))
             .where(ConversationHistoryModel.user_id == self.user_id)
             .order_by(desc(ConversationHistoryModel.timestamp))
             .limit(self.short_term_limit)
@@ -421,27 +471,30 @@ class LongTermMemory:
             (contexto, confianza)
         """
         async with get_session() as session:
-            # Buscar patrones que coincidan
+            # Buscar el patrón contenido en el texto con mayor confianza,
+            # filtrando en la BD en vez de traer y recorrer todos los patrones
             from app.db.models import LearnedPatternModel
 
             result = await session.execute(
-                select(LearnedPatternModel)
+                select(LearnedPatternModel.pattern_value, LearnedPatternModel.confidence)
                 .where(LearnedPatternModel.user_id == self.user_id)
                 .where(LearnedPatternModel.pattern_type == "context_inference")
+                .where(
+                    func.strpos(
+                        literal(text.lower()),
+                        func.lower(LearnedPatternModel.pattern_key)
+                    ) > 0
+                )
+                .where(LearnedPatternModel.confidence > 0)
+                .order_by(LearnedPatternModel.confidence.desc())
+                .limit(1)
             )
-            patterns = result.scalars().all()
-
-            text_lower = text.lower()
-            best_match = None
-            best_confidence = 0.0
+            row = result.first()
 
-            for pattern in patterns:
-                if pattern.pattern_key.lower() in text_lower:
-                    if pattern.confidence > best_confidence:
-                        best_match = pattern.pattern_value
-                        best_confidence = pattern.confidence
+            if not row:
+                return None, 0.0
 
-            return best_match, best_confidence
+            return row.pattern_value, row.confidence
 
     async def learn_pattern(
         self,
@@ -489,6 +489,129 @@ reconócelo y ofrece sesión corta (15-20 min).
 }
 
 
+# Formato de respuesta JSON que el Brain exige al LLM en cada prompt
+RESPONSE_FORMAT_INSTRUCTIONS = """
+## FORMATO DE RESPUESTA
+
+IMPORTANTE: Debes responder en JSON válido con esta estructura:
+{
+    "reasoning": "Tu razonamiento interno (breve)",
+    "tool_calls": [
+        {"tool": "nombre_tool", "args": {...}},
+        ...
+    ],
+    "response": {
+        "message": "Mensaje COMPLETO para el usuario (HTML para Telegram)",
+        "keyboard": [[{"text": "Botón", "callback_data": "action"}]] o null
+    },
+    "memory_updates": {
+        "active_entity": {"type": "task", "id": "xxx", "title": "yyy"} o null,
+        "conversation_mode": "task_management" o null
+    }
+}
+
+REGLAS CRÍTICAS:
+1. NUNCA uses mensajes de "cargando" como "Obteniendo tus tareas..." - siempre da una respuesta FINAL
+2. Si no hay tareas, dilo claramente
+3. Si hay tareas, formátealas con emojis y estructura clara
+4. PROHIBIDO incluir corchetes con texto de botones en el mensaje. Esto está MAL: "[✅ OK] [📝 Editar]"
+5. El campo "message" es SOLO texto HTML puro, SIN representación de botones
+6. Los botones van ÚNICAMENTE en "keyboard" como array de arrays
+7. Máximo 2 botones por fila para que no se corten en móvil
+
+Ejemplo tarea creada (CORRECTO):
+{
+    "response": {
+        "message": "✅ <b>Tarea creada:</b>\\n\\n📋 Revisar código\\n├── 💼 PayCash\\n└── ⏱️ ~30 min",
+        "keyboard": [[{"text": "👍", "callback_data": "task_ok"}], [{"text": "📝 Editar", "callback_data": "task_edit"}]]
+    }
+}
+
+Ejemplo INCORRECTO (NO hacer esto):
+{
+    "response": {
+        "message": "✅ Tarea creada...\\n\\n[✅ OK] [📝 Editar]",
+        "keyboard": null
+    }
+}
+
+Ejemplo cuando NO hay tareas:
+{
+    "response": {
+        "message": "📋 <b>Tareas de hoy</b>\\n\\n✨ No tienes tareas pendientes.",
+        "keyboard": [[{"text": "➕ Nueva tarea", "callback_data": "new_task"}]]
+    }
+}
+
+Ejemplo LISTA de tareas (con botones INDIVIDUALES por tarea):
+{
+    "response": {
+        "message": "📋 <b>Tareas de hoy</b>\\n\\n1️⃣ Revisar PRs\\n├── 💼 PayCash\\n└── ⏱️ ~30 min\\n\\n2️⃣ Actualizar docs\\n├── 💼 PayCash\\n└── ⏱️ ~1h",
+        "keyboard": [
+            [{"text": "✅ Completar #1", "callback_data": "complete_task_UUID1"}],
+            [{"text": "✅ Completar #2", "callback_data": "complete_task_UUID2"}],
+            [{"text": "➕ Nueva", "callback_data": "new_task"}]
+        ]
+    }
+}
+
+Ejemplo tarea COMPLETADA (celebra y ofrece siguiente):
+{
+    "response": {
+        "message": "🎉 <b>¡Tarea completada!</b>\\n\\n✅ Revisar PRs\\n\\n📊 Progreso: 2/5 tareas hoy",
+        "keyboard": [
+            [{"text": "📋 Ver siguientes", "callback_data": "show_tasks"}],
+            [{"text": "➕ Nueva tarea", "callback_data": "new_task"}]
+        ]
+    }
+}
+
+REGLA IMPORTANTE PARA LISTAS:
+- Cada tarea debe tener su PROPIO botón de completar con el UUID real
+- NO uses "finalizar todas" a menos que el usuario lo pida explícitamente
+- Los callback_data deben incluir el UUID real: "complete_task_abc123"
+
+Si no necesitas enviar mensaje (ej: hourly_pulse sin nada relevante), usa:
+{
+    "reasoning": "No hay nada relevante que reportar",
+    "tool_calls": [],
+    "response": null,
+    "memory_updates": null
+}
+"""
+
+
+# Instrucciones para la respuesta final tras ejecutar tools
+TOOL_RESULTS_INSTRUCTIONS = """## INSTRUCCIONES
+Basándote en los resultados de los tools, genera la respuesta para el usuario.
+
+REGLAS CRÍTICAS:
+1. El mensaje debe ser texto HTML puro, SIN corchetes de botones
+2. PROHIBIDO escribir [✅ OK] o [Botón] en el mensaje - eso va en keyboard
+3. Si el tool fue create_task → confirma la creación con datos
+4. Si el tool fue complete_task → celebra la completación
+5. Usa emojis para estructura visual
+
+EJEMPLO CORRECTO para tarea creada:
+{
+    "message": "✅ <b>Tarea creada:</b>\\n\\n📋 Nombre de la tarea\\n├── 💼 Contexto\\n└── ⏱️ ~30 min",
+    "keyboard": [[{"text": "👍", "callback_data": "ok"}]]
+}
+
+EJEMPLO INCORRECTO (NUNCA hacer esto):
+{
+    "message": "✅ Tarea creada...\\n\\n[✅ OK]",
+    "keyboard": null
+}
+
+Responde SOLO con JSON válido:
+{
+    "message": "Mensaje HTML",
+    "keyboard": [[{"text": "Texto", "callback_data": "accion"}]] o null
+}
+"""
+
+
 def get_trigger_prompt(trigger_type: str) -> str:
     """Obtiene el prompt específico para un trigger."""
     return TRIGGER_PROMPTS.get(trigger_type, "")
@@ -7,6 +7,7 @@ El Brain decide qué tools usar basándose en el contexto.
 Para agregar nuevas capacidades, solo agrega más tools aquí.
 """
 
+import json
 import logging
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
@@ -14,15 +15,31 @@ from decimal import Decimal
 from typing import Any, Callable, Coroutine
 from uuid import UUID
 
+import pytz
 from sqlalchemy import select, update, delete, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.db.database import get_session
+from app.telegram_client import get_bot
 
 logger = logging.getLogger(__name__)
 
+# Orden de prioridad de tareas (mayor a menor)
+PRIORITY_ORDER = ["urgent", "high", "normal", "low"]
 
-@dataclass
+# Claves de día usadas en work_days/gym_days, indexadas por date.weekday()
+WEEKDAY_KEYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def _priority_rank(column):
+    """Expresión SQL con el rango numérico de la prioridad (1 = urgent)."""
+    return func.array_position(PRIORITY_ORDER, column)
+
+
+@dataclass(slots=True)
 class ToolResult:
     """Resultado de la ejecución de un tool."""
     success: bool
@@ -31,13 +48,14 @@ class ToolResult:
     error: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Tool:
     """Definición de un tool."""
     name: str
     description: str
     parameters: dict  # JSON Schema de parámetros
     function: Callable[..., Coroutine[Any, Any, ToolResult]]
+    read_only: bool = False  # Solo consulta: se puede ejecutar en paralelo con otros
 
 
 class ToolRegistry:
@@ -50,6 +68,9 @@ class ToolRegistry:
         result = await registry.execute("create_task", title="Mi tarea", priority="high")
     """
 
+    # Los schemas no dependen del usuario: se serializan una vez por proceso
+    _schema_json: str | None = None
+
     def __init__(self, user_id: str):
         self.user_id = user_id
         self._tools: dict[str, Tool] = {}
@@ -83,6 +104,19 @@ class ToolRegistry:
             for tool in self._tools.values()
         ]
 
+    @property
+    def tools_schema_json(self) -> str:
+        """Schema de tools serializado para el prompt (compartido entre usuarios)."""
+        cls = type(self)
+        if cls._schema_json is None:
+            cls._schema_json = json.dumps(self.get_tools_schema(), indent=2, ensure_ascii=False)
+        return cls._schema_json
+
+    def is_read_only(self, tool_name: str) -> bool:
+        """Indica si un tool solo consulta datos (no depende del orden de ejecución)."""
+        tool = self._tools.get(tool_name)
+        return tool is not None and tool.read_only
+
     async def execute(self, tool_name: str, **kwargs) -> ToolResult:
         """Ejecuta un tool por nombre."""
         if tool_name not in self._tools:
@@ -109,21 +143,24 @@ class ToolRegistry:
             name="get_tasks_for_today",
             description="Obtiene todas las tareas programadas para hoy, incluyendo las que están en progreso, vencen hoy, o están marcadas como 'today'.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_tasks_for_today
+            function=self._get_tasks_for_today,
+            read_only=True
         )
 
         self._tools["get_overdue_tasks"] = Tool(
             name="get_overdue_tasks",
             description="Obtiene tareas vencidas (due_date pasado y no completadas).",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_overdue_tasks
+            function=self._get_overdue_tasks,
+            read_only=True
         )
 
         self._tools["get_task_in_progress"] = Tool(
             name="get_task_in_progress",
             description="Obtiene la tarea actualmente en estado 'doing'.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_task_in_progress
+            function=self._get_task_in_progress,
+            read_only=True
         )
 
         self._tools["create_task"] = Tool(
@@ -133,7 +170,7 @@ class ToolRegistry:
                 "type": "object",
                 "properties": {
                     "title": {"type": "string", "description": "Título de la tarea"},
-                    "priority": {"type": "string", "enum": ["urgent", "high", "normal", "low"]},
+                    "priority": {"type": "string", "enum": PRIORITY_ORDER},
                     "due_date": {"type": "string", "description": "Fecha límite (YYYY-MM-DD)"},
                     "context": {"type": "string", "description": "PayCash, Freelance, Personal, Estudio"},
                     "project_id": {"type": "string", "description": "UUID del proyecto"},
@@ -202,14 +239,16 @@ class ToolRegistry:
                 },
                 "required": []
             },
-            function=self._search_tasks
+            function=self._search_tasks,
+            read_only=True
         )
 
         self._tools["get_blocked_tasks"] = Tool(
             name="get_blocked_tasks",
             description="Obtiene tareas que están bloqueadas.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_blocked_tasks
+            function=self._get_blocked_tasks,
+            read_only=True
         )
 
         self._tools["unblock_task"] = Tool(
@@ -234,6 +273,7 @@ class ToolRegistry:
 
             result = await session.execute(
                 select(TaskModel, ProjectModel.name.label("project_name"))
+                .options(defer(TaskModel.embedding))
                 .outerjoin(ProjectModel, TaskModel.project_id == ProjectModel.id)
                 .where(TaskModel.user_id == self.user_id)
                 .where(
@@ -246,10 +286,7 @@ class ToolRegistry:
                 )
                 .order_by(
                     # Prioridad: urgent > high > normal > low
-                    func.array_position(
-                        ["urgent", "high", "normal", "low"],
-                        TaskModel.priority
-                    ),
+                    _priority_rank(TaskModel.priority),
                     TaskModel.due_date.nulls_last()
                 )
             )
@@ -283,10 +320,13 @@ class ToolRegistry:
         from app.db.models import TaskModel
 
         async with get_session() as session:
+            today = date.today()
+
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.user_id == self.user_id)
-                .where(TaskModel.due_date < date.today())
+                .where(TaskModel.due_date < today)
                 .where(TaskModel.status.notin_(["done", "cancelled"]))
                 .order_by(TaskModel.due_date)
             )
@@ -296,7 +336,7 @@ class ToolRegistry:
                     "id": str(t.id),
                     "title": t.title,
                     "due_date": t.due_date.isoformat(),
-                    "days_overdue": (date.today() - t.due_date).days,
+                    "days_overdue": (today - t.due_date).days,
                     "priority": t.priority,
                     "context": t.context
                 }
@@ -316,6 +356,7 @@ class ToolRegistry:
         async with get_session() as session:
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.user_id == self.user_id)
                 .where(TaskModel.status == "doing")
                 .limit(1)
@@ -436,6 +477,7 @@ class ToolRegistry:
             # Buscar tareas activas que coincidan con el título
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.user_id == self.user_id)
                 .where(TaskModel.title.ilike(f"%{title_search}%"))
                 .where(TaskModel.status.notin_(["done", "cancelled"]))
@@ -484,7 +526,11 @@ class ToolRegistry:
         from app.db.models import TaskModel
 
         async with get_session() as session:
-            stmt = select(TaskModel).where(TaskModel.user_id == self.user_id)
+            stmt = (
+                select(TaskModel)
+                .options(defer(TaskModel.embedding))
+                .where(TaskModel.user_id == self.user_id)
+            )
 
             if query:
                 stmt = stmt.where(TaskModel.title.ilike(f"%{query}%"))
@@ -519,6 +565,7 @@ class ToolRegistry:
         async with get_session() as session:
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.user_id == self.user_id)
                 .where(
                     or_(
@@ -578,7 +625,8 @@ class ToolRegistry:
             name="get_active_projects",
             description="Obtiene proyectos activos.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_active_projects
+            function=self._get_active_projects,
+            read_only=True
         )
 
         self._tools["get_project_tasks"] = Tool(
@@ -591,7 +639,8 @@ class ToolRegistry:
                 },
                 "required": ["project_id"]
             },
-            function=self._get_project_tasks
+            function=self._get_project_tasks,
+            read_only=True
         )
 
     async def _get_active_projects(self) -> ToolResult:
@@ -601,6 +650,7 @@ class ToolRegistry:
         async with get_session() as session:
             result = await session.execute(
                 select(ProjectModel)
+                .options(defer(ProjectModel.embedding))
                 .where(ProjectModel.user_id == self.user_id)
                 .where(ProjectModel.status.in_(["active", "planning"]))
                 .order_by(ProjectModel.updated_at.desc())
@@ -628,9 +678,10 @@ class ToolRegistry:
         async with get_session() as session:
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.project_id == project_id)
                 .where(TaskModel.user_id == self.user_id)
-                .order_by(TaskModel.status, TaskModel.priority)
+                .order_by(TaskModel.status, _priority_rank(TaskModel.priority))
             )
 
             tasks = [
@@ -669,7 +720,8 @@ class ToolRegistry:
             name="get_pending_reminders",
             description="Obtiene recordatorios pendientes.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_pending_reminders
+            function=self._get_pending_reminders,
+            read_only=True
         )
 
         self._tools["snooze_reminder"] = Tool(
@@ -791,14 +843,16 @@ class ToolRegistry:
                 },
                 "required": []
             },
-            function=self._get_spending_summary
+            function=self._get_spending_summary,
+            read_only=True
         )
 
         self._tools["get_debt_status"] = Tool(
             name="get_debt_status",
             description="Obtiene estado de deudas activas.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_debt_status
+            function=self._get_debt_status,
+            read_only=True
         )
 
     async def _log_expense(
@@ -875,7 +929,7 @@ class ToolRegistry:
                     "id": str(d.id),
                     "creditor": d.creditor,
                     "current_balance": float(d.current_balance),
-                    "monthly_payment": float(d.monthly_payment) if d.monthly_payment else None,
+                    "monthly_payment": float(d.monthly_payment) if d.monthly_payment is not None else None,
                     "due_day": d.due_day
                 }
                 for d in result.scalars()
@@ -924,7 +978,8 @@ class ToolRegistry:
                 },
                 "required": []
             },
-            function=self._get_workout_history
+            function=self._get_workout_history,
+            read_only=True
         )
 
         self._tools["log_meal"] = Tool(
@@ -947,7 +1002,8 @@ class ToolRegistry:
             name="check_gym_today",
             description="Verifica si hoy es día de gym y si ya fue.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._check_gym_today
+            function=self._check_gym_today,
+            read_only=True
         )
 
         # Body Metrics Tools
@@ -978,7 +1034,8 @@ class ToolRegistry:
                 },
                 "required": []
             },
-            function=self._get_weight_history
+            function=self._get_weight_history,
+            read_only=True
         )
 
         self._tools["get_daily_nutrition_summary"] = Tool(
@@ -991,7 +1048,8 @@ class ToolRegistry:
                 },
                 "required": []
             },
-            function=self._get_daily_nutrition_summary
+            function=self._get_daily_nutrition_summary,
+            read_only=True
         )
 
         self._tools["set_fitness_goal"] = Tool(
@@ -1015,7 +1073,8 @@ class ToolRegistry:
             name="get_fitness_goal_progress",
             description="Obtiene progreso hacia la meta de fitness activa.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_fitness_goal_progress
+            function=self._get_fitness_goal_progress,
+            read_only=True
         )
 
     async def _log_workout(
@@ -1121,14 +1180,15 @@ class ToolRegistry:
             if not profile:
                 return ToolResult(success=False, error="Perfil no encontrado")
 
-            today_weekday = date.today().strftime("%a").lower()
+            today = date.today()
+            today_weekday = WEEKDAY_KEYS[today.weekday()]
             is_gym_day = today_weekday in (profile.gym_days or [])
 
             # Verificar si ya fue
             workout_result = await session.execute(
                 select(WorkoutModel)
                 .where(WorkoutModel.user_id == self.user_id)
-                .where(WorkoutModel.date == date.today())
+                .where(WorkoutModel.date == today)
             )
             already_went = workout_result.scalar_one_or_none() is not None
 
@@ -1153,12 +1213,14 @@ class ToolRegistry:
         from app.db.models import BodyMetricsModel, FitnessGoalModel
 
         async with get_session() as session:
+            today = date.today()
+
             metrics = BodyMetricsModel(
                 user_id=self.user_id,
                 weight_kg=Decimal(str(weight_kg)),
-                body_fat_percentage=Decimal(str(body_fat_percentage)) if body_fat_percentage else None,
-                muscle_mass_kg=Decimal(str(muscle_mass_kg)) if muscle_mass_kg else None,
-                waist_cm=Decimal(str(waist_cm)) if waist_cm else None,
+                body_fat_percentage=Decimal(str(body_fat_percentage)) if body_fat_percentage is not None else None,
+                muscle_mass_kg=Decimal(str(muscle_mass_kg)) if muscle_mass_kg is not None else None,
+                waist_cm=Decimal(str(waist_cm)) if waist_cm is not None else None,
                 time_of_day="morning" if datetime.now().hour < 12 else "evening",
                 notes=notes
             )
@@ -1182,7 +1244,7 @@ class ToolRegistry:
             prev_result = await session.execute(
                 select(BodyMetricsModel)
                 .where(BodyMetricsModel.user_id == self.user_id)
-                .where(BodyMetricsModel.date < date.today())
+                .where(BodyMetricsModel.date < today)
                 .order_by(BodyMetricsModel.date.desc())
                 .limit(1)
             )
@@ -1196,7 +1258,7 @@ class ToolRegistry:
                 success=True,
                 data={
                     "weight_kg": weight_kg,
-                    "date": date.today().isoformat(),
+                    "date": today.isoformat(),
                     "diff_from_previous": diff,
                     "previous_weight": float(prev.weight_kg) if prev else None
                 },
@@ -1226,20 +1288,26 @@ class ToolRegistry:
                     message="No hay registros de peso en este período"
                 )
 
-            history = [
-                {
+            # Historial y estadísticas en una sola pasada
+            history = []
+            min_weight = max_weight = None
+            weight_sum = 0.0
+            for e in entries:
+                weight = float(e.weight_kg)
+                history.append({
                     "date": e.date.isoformat(),
-                    "weight_kg": float(e.weight_kg),
-                    "body_fat_percentage": float(e.body_fat_percentage) if e.body_fat_percentage else None,
-                    "waist_cm": float(e.waist_cm) if e.waist_cm else None
-                }
-                for e in entries
-            ]
-
-            # Calcular estadísticas
-            weights = [float(e.weight_kg) for e in entries]
-            first_weight = weights[-1] if weights else None
-            last_weight = weights[0] if weights else None
+                    "weight_kg": weight,
+                    "body_fat_percentage": float(e.body_fat_percentage) if e.body_fat_percentage is not None else None,
+                    "waist_cm": float(e.waist_cm) if e.waist_cm is not None else None
+                })
+                weight_sum += weight
+                if min_weight is None or weight < min_weight:
+                    min_weight = weight
+                if max_weight is None or weight > max_weight:
+                    max_weight = weight
+
+            first_weight = history[-1]["weight_kg"]
+            last_weight = history[0]["weight_kg"]
             total_change = round(last_weight - first_weight, 2) if first_weight and last_weight else None
 
             return ToolResult(
@@ -1248,9 +1316,9 @@ class ToolRegistry:
                     "entries": history,
                     "count": len(history),
                     "period_days": days,
-                    "min_weight": min(weights) if weights else None,
-                    "max_weight": max(weights) if weights else None,
-                    "avg_weight": round(sum(weights) / len(weights), 2) if weights else None,
+                    "min_weight": min_weight,
+                    "max_weight": max_weight,
+                    "avg_weight": round(weight_sum / len(history), 2),
                     "total_change": total_change,
                     "current_weight": last_weight
                 }
@@ -1272,9 +1340,20 @@ class ToolRegistry:
 
             meals = result.scalars().all()
 
-            # Totales
-            total_calories = sum(m.calories_estimate or 0 for m in meals)
-            total_protein = sum(m.protein_estimate or 0 for m in meals)
+            # Totales y detalle en una sola pasada
+            total_calories = 0
+            total_protein = 0
+            meals_data = []
+            for m in meals:
+                total_calories += m.calories_estimate or 0
+                total_protein += m.protein_estimate or 0
+                meals_data.append({
+                    "meal_type": m.meal_type,
+                    "description": m.description,
+                    "calories": m.calories_estimate,
+                    "protein": m.protein_estimate,
+                    "is_healthy": m.is_healthy
+                })
 
             # Obtener metas si hay
             goal_result = await session.execute(
@@ -1285,17 +1364,6 @@ class ToolRegistry:
             )
             goal = goal_result.scalar_one_or_none()
 
-            meals_data = [
-                {
-                    "meal_type": m.meal_type,
-                    "description": m.description,
-                    "calories": m.calories_estimate,
-                    "protein": m.protein_estimate,
-                    "is_healthy": m.is_healthy
-                }
-                for m in meals
-            ]
-
             return ToolResult(
                 success=True,
                 data={
@@ -1446,14 +1514,16 @@ class ToolRegistry:
             name="get_user_profile",
             description="Obtiene el perfil y preferencias del usuario.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_user_profile
+            function=self._get_user_profile,
+            read_only=True
         )
 
         self._tools["get_current_context"] = Tool(
             name="get_current_context",
             description="Obtiene el contexto actual: hora, día, si es horario laboral, etc.",
             parameters={"type": "object", "properties": {}, "required": []},
-            function=self._get_current_context
+            function=self._get_current_context,
+            read_only=True
         )
 
     async def _get_user_profile(self) -> ToolResult:
@@ -1487,7 +1557,6 @@ class ToolRegistry:
     async def _get_current_context(self) -> ToolResult:
         """Obtiene el contexto actual."""
         from app.db.models import UserProfileModel
-        import pytz
 
         async with get_session() as session:
             result = await session.execute(
@@ -1505,15 +1574,17 @@ class ToolRegistry:
                 current_time = now.time()
                 is_work_hours = profile.work_start <= current_time <= profile.work_end
 
-            is_work_day = now.strftime("%a").lower() in (profile.work_days if profile else [])
+            weekday = now.weekday()
+            day_short = WEEKDAY_KEYS[weekday]
+            is_work_day = day_short in (profile.work_days if profile else [])
 
             return ToolResult(
                 success=True,
                 data={
                     "current_time": now.strftime("%H:%M"),
-                    "current_date": now.strftime("%Y-%m-%d"),
-                    "day_of_week": now.strftime("%A"),
-                    "day_of_week_short": now.strftime("%a").lower(),
+                    "current_date": now.date().isoformat(),
+                    "day_of_week": WEEKDAY_NAMES[weekday],
+                    "day_of_week_short": day_short,
                     "is_work_day": is_work_day,
                     "is_work_hours": is_work_hours and is_work_day,
                     "is_morning": 6 <= now.hour < 12,
@@ -1557,11 +1628,10 @@ class ToolRegistry:
         parse_mode: str = "HTML"
     ) -> ToolResult:
         """Envia un mensaje por Telegram."""
-        from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
         from app.config import get_settings
 
         settings = get_settings()
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = get_bot()
 
         # Construir keyboard si hay
         reply_markup = None
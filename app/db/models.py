@@ -27,6 +27,12 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.database import Base
 
+# Plantillas inmutables para defaults de columnas ARRAY; cada fila recibe
+# su propia lista para que mutarla no altere el default compartido
+DEFAULT_WORK_DAYS = ("mon", "tue", "wed", "thu", "fri")
+DEFAULT_GYM_DAYS = ("mon", "wed", "fri")
+DEFAULT_PAYDAY_DAYS = (15, 30)
+
 # ============================================================
 # USER PROFILE
 # ============================================================
@@ -46,14 +52,14 @@ class UserProfileModel(Base):
     work_start: Mapped[time | None] = mapped_column(Time, default=time(9, 0))
     work_end: Mapped[time | None] = mapped_column(Time, default=time(18, 0))
     work_days: Mapped[list[str] | None] = mapped_column(
-        ARRAY(String), default=["mon", "tue", "wed", "thu", "fri"]
+        ARRAY(String), default=lambda: list(DEFAULT_WORK_DAYS)
     )
     lunch_start: Mapped[time | None] = mapped_column(Time, default=time(13, 0))
     lunch_end: Mapped[time | None] = mapped_column(Time, default=time(14, 0))
 
     # Gym
     gym_days: Mapped[list[str] | None] = mapped_column(
-        ARRAY(String), default=["mon", "wed", "fri"]
+        ARRAY(String), default=lambda: list(DEFAULT_GYM_DAYS)
     )
     gym_preferred_time: Mapped[time | None] = mapped_column(Time, default=time(7, 0))
 
@@ -72,7 +78,9 @@ class UserProfileModel(Base):
 
     # Finanzas
     monthly_budget: Mapped[float | None] = mapped_column(Numeric(10, 2), default=15000)
-    payday_days: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), default=[15, 30])
+    payday_days: Mapped[list[int] | None] = mapped_column(
+        ARRAY(Integer), default=lambda: list(DEFAULT_PAYDAY_DAYS)
+    )
 
     # Config
     timezone: Mapped[str] = mapped_column(String(50), default="America/Mexico_City")
@@ -10,6 +10,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from telegram import Update
 
 from app.config import get_settings
 
@@ -46,7 +47,11 @@ async def lifespan(app: FastAPI):
     from app.triggers import setup_scheduler
     await setup_scheduler()
 
-    # 4. Enviar alerta de inicio
+    # 4. Precalentar el Brain del usuario por defecto
+    logger.info("Precalentando Brain...")
+    await warm_up_brain()
+
+    # 5. Enviar alerta de inicio
     logger.info("Enviando alerta de startup...")
     await send_startup_alert()
 
@@ -122,7 +127,6 @@ async def health_check_detailed():
 @app.post("/telegram/webhook")
 async def telegram_webhook(request: Request):
     """Webhook para mensajes de Telegram."""
-    from telegram import Update
     from app.bot.handlers import get_application
 
     try:
@@ -168,12 +172,38 @@ async def manual_trigger(trigger_name: str):
 # ==================== HELPERS ====================
 
 
+async def warm_up_brain():
+    """
+    Crea el Brain del usuario por defecto al arrancar.
+
+    Así el primer mensaje o trigger no paga la carga de memoria,
+    la creación del modelo ni la serialización del schema de tools.
+    """
+    try:
+        from app.brain import get_brain
+        from app.triggers.handlers import get_default_user_id
+
+        user_id = await get_default_user_id()
+        if not user_id:
+            return
+
+        brain = await get_brain(user_id)
+        model = brain.model
+        schema = brain.tools.tools_schema_json
+        logger.info(
+            f"Brain precalentado para user {user_id} "
+            f"({model.model_name}, schema de {len(schema)} chars)"
+        )
+    except Exception as e:
+        logger.error(f"Error precalentando Brain: {e}")
+
+
 async def send_startup_alert():
     """Envía alerta de inicio por Telegram."""
     try:
-        from telegram import Bot
+        from app.telegram_client import get_bot
 
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = get_bot()
         await bot.send_message(
             chat_id=settings.telegram_chat_id,
             text=(
@@ -190,9 +220,9 @@ async def send_startup_alert():
 async def send_shutdown_alert():
     """Envía alerta de shutdown por Telegram."""
     try:
-        from telegram import Bot
+        from app.telegram_client import get_bot
 
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = get_bot()
         await bot.send_message(
             chat_id=settings.telegram_chat_id,
             text="🔴 <b>Carlos Brain V2 detenido</b>",
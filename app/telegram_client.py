@@ -0,0 +1,35 @@
+"""
+Cliente de Telegram compartido.
+
+Un solo Bot para enviar mensajes desde los triggers y los tools del Brain,
+sin que un módulo dependa del otro.
+"""
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from app.config import get_settings
+
+# Conexiones simultáneas del Bot compartido. El default de HTTPXRequest es 1:
+# con varios triggers en paralelo (TRIGGER_CONCURRENCY usuarios cada uno)
+# más el tool send_message, los envíos agotarían pool_timeout y fallarían
+TELEGRAM_CONNECTION_POOL_SIZE = 16
+
+# Segundos que un envío espera una conexión libre antes de TimedOut
+TELEGRAM_POOL_TIMEOUT = 10.0
+
+_bot: Bot | None = None
+
+
+def get_bot() -> Bot:
+    """Obtiene o crea el cliente de Telegram compartido."""
+    global _bot
+    if _bot is None:
+        _bot = Bot(
+            token=get_settings().telegram_bot_token,
+            request=HTTPXRequest(
+                connection_pool_size=TELEGRAM_CONNECTION_POOL_SIZE,
+                pool_timeout=TELEGRAM_POOL_TIMEOUT,
+            ),
+        )
+    return _bot
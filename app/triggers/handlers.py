@@ -5,20 +5,28 @@ Cada handler es simple: obtiene el Brain y llama a run_trigger().
 La lógica de qué hacer está en el Brain, no aquí.
 """
 
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, timedelta
+from typing import Any
 
 from sqlalchemy import select, and_
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy.orm import defer
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from app.brain import get_brain
 from app.brain.core import BrainResponse
 from app.config import get_settings
 from app.db.database import get_session
+from app.telegram_client import get_bot
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Máximo de usuarios procesados en paralelo por un trigger (llamadas al LLM)
+TRIGGER_CONCURRENCY = 4
+
 
 async def _send_telegram_message(response: BrainResponse) -> bool:
     """
@@ -30,7 +38,7 @@ async def _send_telegram_message(response: BrainResponse) -> bool:
         return False
 
     try:
-        bot = Bot(token=settings.telegram_bot_token)
+        bot = get_bot()
 
         # Construir keyboard si hay
         reply_markup = None
@@ -61,7 +69,51 @@ async def _send_telegram_message(response: BrainResponse) -> bool:
         return False
 
 
-async def _get_default_user_id() -> str | None:
+async def _run_for_users(
+    label: str,
+    items_by_user: dict[str, Any],
+    run: Callable[[str, Any], Awaitable[None]],
+) -> None:
+    """
+    Ejecuta run(user_id, item) para varios usuarios en paralelo.
+
+    Limita la concurrencia a TRIGGER_CONCURRENCY; un error en un usuario
+    se loguea y no impide procesar a los demás.
+    """
+    semaphore = asyncio.Semaphore(TRIGGER_CONCURRENCY)
+
+    async def run_limited(user_id: str, item: Any) -> None:
+        async with semaphore:
+            await run(user_id, item)
+
+    results = await asyncio.gather(
+        *(run_limited(user_id, item) for user_id, item in items_by_user.items()),
+        return_exceptions=True,
+    )
+
+    for user_id, result in zip(items_by_user, results, strict=True):
+        if isinstance(result, Exception):
+            logger.error(f"Error en {label} para {user_id}: {result}")
+
+
+async def _run_trigger_for_users(
+    trigger: str,
+    tasks_by_user: dict[str, list[dict]]
+) -> None:
+    """
+    Ejecuta un trigger del Brain para varios usuarios en paralelo.
+
+    Cada usuario recibe su propio contexto {"tasks": [...]}.
+    """
+    async def run_for_user(user_id: str, user_tasks: list[dict]) -> None:
+        brain = await get_brain(user_id)
+        response = await brain.run_trigger(trigger, context={"tasks": user_tasks})
+        await _send_telegram_message(response)
+
+    await _run_for_users(trigger, tasks_by_user, run_for_user)
+
+
+async def get_default_user_id() -> str | None:
     """
     Obtiene el UUID del usuario por defecto (para triggers automáticos).
 
@@ -89,7 +141,7 @@ async def _get_default_user_id() -> str | None:
 
 async def trigger_morning_briefing() -> None:
     """Trigger del morning briefing - 6:30 AM."""
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         logger.warning("No hay user_id configurado para morning_briefing")
         return
@@ -109,12 +161,21 @@ async def trigger_morning_briefing() -> None:
 
 async def trigger_gym_check(escalation_level: int = 1) -> None:
     """Trigger del gym check - 7:15, 7:30, 7:45 AM."""
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
     try:
         brain = await get_brain(user_id)
+
+        # Si no es día de gym o ya fue, el LLM no enviaría nada: evitar la llamada
+        gym_status = await brain.tools.execute("check_gym_today")
+        if gym_status.success and (
+            not gym_status.data["is_gym_day"] or gym_status.data["already_went"]
+        ):
+            logger.debug(f"Gym check (level {escalation_level}): no aplica hoy")
+            return
+
         response = await brain.run_trigger(
             "gym_check",
             context={"escalation_level": escalation_level}
@@ -131,7 +192,7 @@ async def trigger_gym_check(escalation_level: int = 1) -> None:
 
 async def trigger_hourly_pulse() -> None:
     """Trigger del hourly pulse - cada hora 9-18 L-V."""
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
@@ -151,7 +212,7 @@ async def trigger_hourly_pulse() -> None:
 
 async def trigger_evening_reflection() -> None:
     """Trigger de reflexión de la noche - 9 PM."""
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
@@ -168,7 +229,7 @@ async def trigger_evening_reflection() -> None:
 
 async def trigger_weekly_review() -> None:
     """Trigger de revisión semanal - Domingo 10 AM."""
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
@@ -208,26 +269,33 @@ async def trigger_reminder_check() -> None:
 
             logger.info(f"Procesando {len(reminders)} reminders")
 
+            # Agrupar por usuario: cada usuario comparte un Brain (y su memoria),
+            # así que sus reminders van en secuencia; usuarios distintos en paralelo
+            reminders_by_user: dict[str, list] = {}
             for reminder in reminders:
-                user_id = str(reminder.user_id)
+                reminders_by_user.setdefault(str(reminder.user_id), []).append(reminder)
 
+            async def process_user_reminders(user_id: str, user_reminders: list) -> None:
                 brain = await get_brain(user_id)
-                response = await brain.run_trigger(
-                    "reminder_due",
-                    context={
-                        "reminder_id": str(reminder.id),
-                        "message": reminder.message,
-                        "task_id": str(reminder.task_id) if reminder.task_id else None,
-                    }
-                )
-
-                # Enviar mensaje a Telegram
-                if await _send_telegram_message(response):
-                    logger.info(f"Reminder {reminder.id} enviado")
-
-                # Marcar como enviado
-                reminder.status = "sent"
-                reminder.sent_at = now
+                for reminder in user_reminders:
+                    response = await brain.run_trigger(
+                        "reminder_due",
+                        context={
+                            "reminder_id": str(reminder.id),
+                            "message": reminder.message,
+                            "task_id": str(reminder.task_id) if reminder.task_id else None,
+                        }
+                    )
+
+                    # Enviar mensaje a Telegram
+                    if await _send_telegram_message(response):
+                        logger.info(f"Reminder {reminder.id} enviado")
+
+                    # Marcar como enviado
+                    reminder.status = "sent"
+                    reminder.sent_at = now
+
+            await _run_for_users("reminder_check", reminders_by_user, process_user_reminders)
 
             await session.commit()
 
@@ -242,17 +310,18 @@ async def trigger_deadline_check() -> None:
     Busca tareas que venzan en las próximas 24h.
     """
     from app.db.models import TaskModel
-    from datetime import date
 
     try:
         async with get_session() as session:
-            tomorrow = date.today() + timedelta(days=1)
+            today = date.today()
+            tomorrow = today + timedelta(days=1)
 
             # Tareas que vencen hoy o mañana
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.due_date <= tomorrow)
-                .where(TaskModel.due_date >= date.today())
+                .where(TaskModel.due_date >= today)
                 .where(TaskModel.status.notin_(["done", "cancelled"]))
             )
             tasks = result.scalars().all()
@@ -274,13 +343,7 @@ async def trigger_deadline_check() -> None:
                     "priority": task.priority,
                 })
 
-            for user_id, user_tasks in tasks_by_user.items():
-                brain = await get_brain(user_id)
-                response = await brain.run_trigger(
-                    "deadline_approaching",
-                    context={"tasks": user_tasks}
-                )
-                await _send_telegram_message(response)
+            await _run_trigger_for_users("deadline_approaching", tasks_by_user)
 
             logger.info(f"deadline_check: procesadas {len(tasks)} tareas")
 
@@ -298,11 +361,13 @@ async def trigger_stuck_tasks_check() -> None:
 
     try:
         async with get_session() as session:
-            three_days_ago = datetime.now() - timedelta(days=3)
+            now = datetime.now()
+            three_days_ago = now - timedelta(days=3)
 
             # Tareas en "doing" que no se han actualizado en 3+ días
             result = await session.execute(
                 select(TaskModel)
+                .options(defer(TaskModel.embedding))
                 .where(TaskModel.status == "doing")
                 .where(TaskModel.updated_at < three_days_ago)
             )
@@ -318,20 +383,14 @@ async def trigger_stuck_tasks_check() -> None:
                 user_key = str(task.user_id)
                 if user_key not in tasks_by_user:
                     tasks_by_user[user_key] = []
-                days_stuck = (datetime.now() - task.updated_at).days
+                days_stuck = (now - task.updated_at).days
                 tasks_by_user[user_key].append({
                     "id": str(task.id),
                     "title": task.title,
                     "days_stuck": days_stuck,
                 })
 
-            for user_id, user_tasks in tasks_by_user.items():
-                brain = await get_brain(user_id)
-                response = await brain.run_trigger(
-                    "task_stuck",
-                    context={"tasks": user_tasks}
-                )
-                await _send_telegram_message(response)
+            await _run_trigger_for_users("task_stuck", tasks_by_user)
 
             logger.info(f"stuck_tasks_check: procesadas {len(tasks)} tareas")
 
@@ -343,7 +402,7 @@ async def trigger_payday_alert(is_pre: bool = True) -> None:
     """
     Alerta de quincena - pre (días 13, 14, 28, 29) y post (15, 30).
     """
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
@@ -371,12 +430,21 @@ async def trigger_meal_reminder(meal_type: str = "lunch") -> None:
 
     Pregunta qué comió y ofrece registrarlo.
     """
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
     try:
         brain = await get_brain(user_id)
+
+        # Si la comida ya está registrada, preguntar por ella no aporta nada
+        nutrition = await brain.tools.execute("get_daily_nutrition_summary")
+        if nutrition.success and any(
+            meal["meal_type"] == meal_type for meal in nutrition.data["meals"]
+        ):
+            logger.debug(f"Meal reminder ({meal_type}): ya registrada")
+            return
+
         response = await brain.run_trigger(
             "meal_reminder",
             context={
@@ -398,7 +466,7 @@ async def trigger_proactive_checkin(period: str = "morning") -> None:
 
     Diferente del hourly_pulse que es silencioso.
     """
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
@@ -425,7 +493,7 @@ async def trigger_study_reminder() -> None:
 
     Sugiere qué estudiar basándose en balance y progreso.
     """
-    user_id = await _get_default_user_id()
+    user_id = await get_default_user_id()
     if not user_id:
         return
 
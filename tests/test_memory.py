@@ -0,0 +1,106 @@
+"""
+Tests de persistencia de memoria del Brain.
+
+Dos process() concurrentes del mismo usuario comparten el MemoryManager:
+cada mensaje debe escribirse una sola vez y las transacciones no deben cruzarse.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.brain import memory as memory_module
+from app.brain.core import BrainResponse, CarlosBrain
+
+
+class FakeDB:
+    """Registra lo que save() escribe y cuántas sesiones hay abiertas a la vez."""
+
+    def __init__(self, fail_commit: bool = False):
+        self.written: list[str] = []
+        self.open_sessions = 0
+        self.max_open_sessions = 0
+        self.fail_commit = fail_commit
+
+    @asynccontextmanager
+    async def get_session(self):
+        self.open_sessions += 1
+        self.max_open_sessions = max(self.max_open_sessions, self.open_sessions)
+        try:
+            yield self
+        finally:
+            self.open_sessions -= 1
+
+    async def commit(self) -> None:
+        # Ceder el loop para que el otro process() avance durante la transacción
+        await asyncio.sleep(0.01)
+        if self.fail_commit:
+            raise RuntimeError("commit falló")
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(memory_module, "get_session", db.get_session)
+    return db
+
+
+def make_brain(db: FakeDB) -> CarlosBrain:
+    brain = CarlosBrain("user-test")
+    brain._initialized = True
+
+    async def build_prompt(user_message, trigger, context, callback_data):
+        await asyncio.sleep(0)
+        return user_message
+
+    async def call_llm(prompt):
+        await asyncio.sleep(0)
+        return {"message": f"respuesta a {prompt}"}
+
+    async def process_response(response, original_message=None):
+        return BrainResponse(message=response["message"])
+
+    async def save_message(session, message):
+        await asyncio.sleep(0)
+        db.written.append(message.content)
+
+    async def save_working_memory(session):
+        await asyncio.sleep(0)
+        db.written.append("<working>")
+
+    brain._build_prompt = build_prompt
+    brain._call_llm = call_llm
+    brain._process_response = process_response
+    brain.memory._save_message = save_message
+    brain.memory._save_working_memory = save_working_memory
+    return brain
+
+
+async def test_concurrent_process_saves_each_message_once(fake_db):
+    brain = make_brain(fake_db)
+
+    await asyncio.gather(brain.process("hola"), brain.process("adiós"))
+
+    messages = [item for item in fake_db.written if item != "<working>"]
+    assert sorted(messages) == sorted([
+        "hola", "respuesta a hola", "adiós", "respuesta a adiós",
+    ])
+    assert fake_db.max_open_sessions == 1
+    assert brain.memory._unsaved == []
+
+
+async def test_failed_save_keeps_pending_messages(fake_db):
+    brain = make_brain(fake_db)
+    fake_db.fail_commit = True
+
+    await brain.process("hola")
+
+    assert [m.content for m in brain.memory._unsaved] == ["hola", "respuesta a hola"]
+
+    fake_db.fail_commit = False
+    fake_db.written.clear()
+    await brain.memory.save()
+
+    assert fake_db.written == ["hola", "respuesta a hola", "<working>"]
+    assert brain.memory._unsaved == []